@@ -4,6 +4,8 @@ Sync data from local Supabase database to online Supabase.
 Handles big data with batch processing and error recovery.
 """
 
+import csv
+import io
 import os
 import sys
 import time
@@ -15,6 +17,7 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 import pandas as pd
 from supabase import create_client, Client
+import psycopg2
 import json
 
 # Configure logging
@@ -33,7 +36,8 @@ class BigDataSupabaseSync:
                  local_db_url: str,
                  online_supabase_url: str,
                  online_service_role_key: str,
-                 batch_size: int = 1000):
+                 batch_size: int = 1000,
+                 online_db_url: Optional[str] = None):
         """
         Initialize the sync service.
         
@@ -42,15 +46,20 @@ class BigDataSupabaseSync:
             online_supabase_url: Online Supabase project URL
             online_service_role_key: Service role key for online Supabase
             batch_size: Number of records to process in each batch
+            online_db_url: Optional direct PostgreSQL URL for the online
+                database; when set, batches load via COPY instead of the
+                REST upsert, which is 10-50x faster for bulk inserts
         """
         self.local_db_url = local_db_url
         self.online_supabase_url = online_supabase_url
         self.online_service_role_key = online_service_role_key
         self.batch_size = batch_size
+        self.online_db_url = online_db_url
         
         # Initialize connections
         self.local_engine = create_engine(local_db_url)
         self.supabase: Client = create_client(online_supabase_url, online_service_role_key)
+        self._copy_conn = None
         
         # Sync statistics
         self.sync_stats = {
@@ -165,12 +174,57 @@ class BigDataSupabaseSync:
             logger.error(f"Error clearing online table {table_name}: {e}")
             return False
     
+    def _get_copy_conn(self):
+        """Lazily open (and reuse) a direct PostgreSQL connection for COPY."""
+        if self._copy_conn is None or self._copy_conn.closed:
+            self._copy_conn = psycopg2.connect(self.online_db_url)
+        return self._copy_conn
+
+    def copy_insert_online(self, table_name: str, records: List[Dict[str, Any]]) -> bool:
+        """
+        Bulk-load a batch with COPY FROM STDIN.
+
+        COPY streams the whole batch in one protocol message, skipping
+        per-row SQL parsing and round trips — the standard 10-50x win over
+        row INSERTs/upserts. Unlike the REST upsert it does not resolve
+        conflicts, so it assumes the target table was cleared first.
+        """
+        try:
+            columns = list(records[0].keys())
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for record in records:
+                writer.writerow([
+                    '\\N' if record[col] is None else record[col] for col in columns
+                ])
+            buffer.seek(0)
+
+            conn = self._get_copy_conn()
+            with conn.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {table_name} ({', '.join(columns)}) "
+                    f"FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+                    buffer
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error COPY-loading batch into {table_name}: {e}")
+            if self._copy_conn is not None and not self._copy_conn.closed:
+                self._copy_conn.rollback()
+            return False
+
     def batch_insert_online(self, table_name: str, records: List[Dict[str, Any]]) -> bool:
         """Insert batch of records into online Supabase."""
         try:
             if not records:
                 return True
             
+            # Prefer the COPY fast path when a direct database URL is
+            # configured; the REST upsert remains the conflict-safe fallback
+            if self.online_db_url:
+                return self.copy_insert_online(table_name, records)
+            
             # Use upsert to handle potential conflicts
             self.supabase.table(table_name).upsert(records).execute()
             return True
@@ -319,7 +373,8 @@ def main():
             local_db_url=local_db_url,
             online_supabase_url=online_supabase_url,
             online_service_role_key=online_service_role_key,
-            batch_size=1000  # Adjust based on your needs
+            batch_size=1000,  # Adjust based on your needs
+            online_db_url=os.getenv("SUPABASE_DB_URL")  # enables the COPY fast path
         )
         
         # Run sync
@@ -109,6 +109,75 @@ class ChatHistoryManager:
             logger.error(f"Failed to add message to chat history: {str(e)}")
             return False
 
+    def add_messages_bulk(self, session_id: str, messages: List[tuple]) -> bool:
+        """
+        Add several messages to a session with a single INSERT statement.
+
+        Coalesces the per-turn user/assistant writes into one round trip,
+        which matters now that persistence runs as a background task.
+
+        Args:
+            session_id: UUID of the chat session
+            messages: List of (role, message, full_response) tuples, where
+                full_response may be None
+
+        Returns:
+            Boolean indicating success
+        """
+        if not messages:
+            return True
+
+        try:
+            prepared = []
+            for role, message, full_response in messages:
+                # Count tokens and truncate exactly as add_message does
+                token_count = self.count_tokens(message)
+                if token_count > self.max_tokens_per_message:
+                    logger.warning(f"Message exceeds token limit ({token_count} > {self.max_tokens_per_message}), truncating")
+                    message = message[:self.max_tokens_per_message * 4] + "... [truncated]"
+                prepared.append((role, message, full_response, token_count))
+
+            with self.db_manager.get_session() as session:
+                next_turn_index = self.get_next_turn_index(session_id)
+
+                values_clauses = []
+                params = {
+                    'session_id': session_id,
+                    'created_at': datetime.now()
+                }
+                for i, (role, message, full_response, token_count) in enumerate(prepared):
+                    message_metadata = {
+                        'token_count': token_count,
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    values_clauses.append(
+                        f"(:session_id, :turn_index_{i}, :role_{i}, :message_{i}, "
+                        f"CAST(:metadata_{i} AS jsonb), CAST(:full_response_{i} AS jsonb), :created_at)"
+                    )
+                    params[f'turn_index_{i}'] = next_turn_index + i
+                    params[f'role_{i}'] = role
+                    params[f'message_{i}'] = message
+                    params[f'metadata_{i}'] = json.dumps(message_metadata)
+                    params[f'full_response_{i}'] = json.dumps(full_response) if full_response else '{}'
+
+                query = text(
+                    "INSERT INTO chat_history (session_id, turn_index, role, message, metadata, full_response, created_at) "
+                    "VALUES " + ", ".join(values_clauses)
+                )
+
+                session.execute(query, params)
+                session.commit()
+                logger.info(f"Added {len(prepared)} messages to session {session_id} in one statement")
+
+                # Check if we need to optimize the conversation history
+                self.optimize_conversation_history(session_id)
+
+                return True
+
+        except exc.SQLAlchemyError as e:
+            logger.error(f"Failed to bulk add messages to chat history: {str(e)}")
+            return False
+
     def get_recent_history(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """
         Retrieve recent chat history for a session.
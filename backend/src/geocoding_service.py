@@ -107,19 +107,28 @@ class GeographicService:
         """
         Generate SQL WHERE condition for proximity search
         Uses Haversine formula for distance calculation (PostgreSQL compatible)
+
+        The reference point's trig terms are constant for the whole query,
+        so they are evaluated here and emitted as literals — the database
+        computes radians/sin/cos only for the row's own coordinates instead
+        of re-deriving the reference values on every row.
         """
+        ref_cos = math.cos(math.radians(location.latitude))
+        ref_sin = math.sin(math.radians(location.latitude))
+        ref_lon_rad = math.radians(location.longitude)
+
         sql_condition = f"""
         (
             6371 * acos(
-                cos(radians({location.latitude})) *
+                {ref_cos:.12f} *
                 cos(radians(cycles.latitude)) *
-                cos(radians(cycles.longitude) - radians({location.longitude})) +
-                sin(radians({location.latitude})) *
+                cos(radians(cycles.longitude) - {ref_lon_rad:.12f}) +
+                {ref_sin:.12f} *
                 sin(radians(cycles.latitude))
             )
         ) <= {radius_km}
         """
-        
+
         return sql_condition.strip()
     
     def enhance_query_with_location(self, user_query: str) -> Tuple[str, Optional[str]]:
@@ -4,6 +4,7 @@ Determines what type of response the user expects
 """
 
 import re
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple, Any
 from enum import Enum
 from dataclasses import dataclass
@@ -104,26 +105,46 @@ class IntentDetectionService:
             'pie': [r'\b(pie|percentage|proportion|distribution)\b'],
             '3d': [r'\b(3d|three dimension|surface|contour)\b'],
         }
-    
+
+        # Precompile every pattern once so analyze_intent never re-compiles
+        # regexes on the per-request path
+        self.intent_patterns = {
+            response_type: [re.compile(p, re.IGNORECASE) for p in patterns]
+            for response_type, patterns in self.intent_patterns.items()
+        }
+        self.data_requiring_patterns = [re.compile(p) for p in self.data_requiring_patterns]
+        self.visualization_patterns = {
+            viz_type: [re.compile(p) for p in patterns]
+            for viz_type, patterns in self.visualization_patterns.items()
+        }
+
+        # Intent is deterministic for a given query string, so repeated
+        # queries collapse to a dict lookup
+        self._analyze_cached = lru_cache(maxsize=8192)(self._analyze_uncached)
+
     def analyze_intent(self, user_query: str, chat_history: Optional[List[Dict[str, Any]]] = None) -> IntentResult:
         """
-        Analyze user query and determine the intended response type, 
+        Analyze user query and determine the intended response type,
         optionally using chat history for context.
         """
-        
-        query_lower = user_query.lower().strip()
-        
+        # Classification currently depends only on the query text, so the
+        # cache is keyed on the normalized query alone
+        return self._analyze_cached(user_query.lower().strip())
+
+    def _analyze_uncached(self, query_lower: str) -> IntentResult:
+        """Run the full pattern-matching analysis for a normalized query."""
+
         # Check each intent type
         intent_scores = {}
-        
+
         for response_type, patterns in self.intent_patterns.items():
             score = 0
             matching_patterns = []
-            
+
             for pattern in patterns:
-                if re.search(pattern, query_lower, re.IGNORECASE):
+                if pattern.search(query_lower):
                     score += 1
-                    matching_patterns.append(pattern)
+                    matching_patterns.append(pattern.pattern)
             
             if score > 0:
                 intent_scores[response_type] = {
@@ -134,7 +155,7 @@ class IntentDetectionService:
         # Determine primary intent
         if not intent_scores:
             # Default fallback logic
-            if len(query_lower.split()) <= 3 and not any(re.search(p, query_lower) for p in self.data_requiring_patterns):
+            if len(query_lower.split()) <= 3 and not any(p.search(query_lower) for p in self.data_requiring_patterns):
                 primary_intent = ResponseType.CONVERSATIONAL
                 confidence = 0.7
             else:
@@ -153,13 +174,13 @@ class IntentDetectionService:
             confidence += 0.1 # Boost confidence slightly
         
         # Determine if data is required
-        requires_data = any(re.search(p, query_lower) for p in self.data_requiring_patterns)
+        requires_data = any(p.search(query_lower) for p in self.data_requiring_patterns)
         
         # Determine visualization type if applicable
         visualization_type = None
         if primary_intent == ResponseType.VISUALIZATION:
             for viz_type, patterns in self.visualization_patterns.items():
-                if any(re.search(p, query_lower) for p in patterns):
+                if any(p.search(query_lower) for p in patterns):
                     visualization_type = viz_type
                     break
             if not visualization_type:
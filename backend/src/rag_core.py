@@ -8,22 +8,76 @@ Handles query embedding, context retrieval, prompt engineering, and LLM invocati
 Author: FloatChat Backend System
 """
 
+import asyncio
+import functools
 import logging
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
-import json
+import orjson
 import time
 import os
 from sentence_transformers import SentenceTransformer
 import chromadb
 from chromadb.config import Settings
+import numpy as np
 import requests
-from dataclasses import dataclass
+from requests.adapters import HTTPAdapter, Retry
+from dataclasses import dataclass, replace
 from .geocoding_service import GeographicService
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the plain NumPy path still works
+    njit = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def _mmr_select_py(sims_q: np.ndarray, sims_dd: np.ndarray,
+                   lambda_mult: float, k: int) -> np.ndarray:
+    """
+    Maximal Marginal Relevance selection over candidate documents.
+
+    Iteratively picks the candidate maximizing
+    lambda * sim(query, doc) - (1 - lambda) * max sim(doc, selected),
+    trading query relevance against redundancy. Written as tight scalar
+    loops so Numba can compile it to SIMD code; the pure-Python fallback
+    is still fine at retrieval-sized candidate counts.
+    """
+    n = sims_q.shape[0]
+    selected = np.empty(k, dtype=np.int64)
+    chosen = np.zeros(n, dtype=np.bool_)
+    max_sim_selected = np.zeros(n, dtype=np.float32)
+
+    for pick in range(k):
+        best_idx = -1
+        best_score = -np.inf
+        for i in range(n):
+            if chosen[i]:
+                continue
+            if pick == 0:
+                score = sims_q[i]
+            else:
+                score = lambda_mult * sims_q[i] - (1.0 - lambda_mult) * max_sim_selected[i]
+            if score > best_score:
+                best_score = score
+                best_idx = i
+        selected[pick] = best_idx
+        chosen[best_idx] = True
+        for i in range(n):
+            if sims_dd[best_idx, i] > max_sim_selected[i]:
+                max_sim_selected[i] = sims_dd[best_idx, i]
+
+    return selected
+
+if njit is not None:
+    _mmr_select = njit(cache=True, fastmath=True)(_mmr_select_py)
+else:
+    _mmr_select = _mmr_select_py
+
 @dataclass
 class QueryResult:
     """Data class for RAG query results"""
@@ -33,14 +87,85 @@ class QueryResult:
     processing_time: float
     reasoning: str
 
+class _EmbedBatcher:
+    """
+    Micro-batcher for concurrent embedding requests.
+
+    Per-request encode calls run with batch_size=1 and leave the encoder
+    underutilized. Concurrent callers enqueue their query with a future; a
+    background task drains up to `max_batch` pending items (waiting at most
+    `window_ms` for stragglers), sorts the batch by length to minimize
+    padding, encodes everything in one forward pass, and resolves the
+    futures. Under concurrent load this amortizes tokenizer and model
+    overhead across the batch; a lone request still completes within the
+    batching window.
+    """
+
+    def __init__(self, model: Any, max_batch: int = 32, window_ms: float = 8.0,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.model = model
+        self.max_batch = max_batch
+        self.window_s = window_ms / 1000.0
+        self._executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._drain_task: Optional[asyncio.Task] = None
+
+    async def encode(self, query: str) -> np.ndarray:
+        """Enqueue a query and await its embedding."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None:
+            # Lazily bind the queue and drain task to the running loop
+            self._queue = asyncio.Queue()
+            self._drain_task = loop.create_task(self._drain())
+        future: asyncio.Future = loop.create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    async def _drain(self) -> None:
+        """Collect pending queries into batches and encode them together."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Encode in length order so similar-length queries pad together
+            order = sorted(range(len(batch)), key=lambda i: len(batch[i][0]))
+            texts = [batch[i][0] for i in order]
+            try:
+                embeddings = await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(
+                        self.model.encode, texts,
+                        convert_to_numpy=True, normalize_embeddings=True
+                    )
+                )
+                for idx, embedding in zip(order, embeddings):
+                    future = batch[idx][1]
+                    if not future.done():
+                        future.set_result(embedding)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
 class FloatChatRAGCore:
     """
     Core RAG system for converting natural language queries to SQL.
     Implements embedding-based retrieval and prompt engineering for LLM interaction.
     """
 
-    def __init__(self, chroma_host: str = "localhost", chroma_port: int = 8000, 
-                 llm_client: Any = None, llm_provider: str = "deepseek"):
+    def __init__(self, chroma_host: str = "localhost", chroma_port: int = 8000,
+                 llm_client: Any = None, llm_provider: str = "deepseek",
+                 semantic_cache_threshold: float = 0.97,
+                 chroma_persist_dir: Optional[str] = None):
         """
         Initialize the RAG core system.
 
@@ -49,25 +174,98 @@ class FloatChatRAGCore:
             chroma_port: ChromaDB server port
             llm_client: The initialized LLM client
             llm_provider: The name of the LLM provider
+            semantic_cache_threshold: Minimum cosine similarity for a cached
+                result to be reused for a near-duplicate query
+            chroma_persist_dir: When set, run ChromaDB in-process against
+                this directory instead of the HTTP server
         """
         self.llm_client = llm_client
         self.llm_provider = llm_provider
 
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("Loaded sentence transformer model")
-
-        # Initialize ChromaDB client
-        self.chroma_client = chromadb.HttpClient(
-            host=chroma_host,
-            port=chroma_port,
-            settings=Settings(allow_reset=True, anonymized_telemetry=False)
-        )
+        # Initialize embedding model. Prefer the ONNX Runtime backend: the
+        # exported MiniLM encoder runs ~3-4x faster than eager PyTorch on CPU
+        # through operator fusion and SIMD kernels. Fall back to the default
+        # PyTorch backend when onnxruntime/optimum are not installed.
+        try:
+            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2', backend='onnx')
+            logger.info("Loaded sentence transformer model (ONNX Runtime backend)")
+        except Exception as e:
+            logger.warning(f"ONNX backend unavailable ({str(e)}), using PyTorch backend")
+            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            logger.info("Loaded sentence transformer model")
+
+        # Bounded LRU cache of query embeddings; repeated queries are common
+        # in chat UIs and can skip the transformer forward pass entirely
+        self._embed_cache: OrderedDict = OrderedDict()
+        self._embed_cache_size = 1024
+
+        # Dedicated worker pool for the blocking pipeline stages (encoder,
+        # ChromaDB round trip, geocoding, LLM HTTP call). A private pool
+        # keeps these off the default executor shared with the rest of the
+        # process and caps their concurrency in one place.
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag")
+
+        # Micro-batcher: concurrent embed calls from different requests are
+        # coalesced into one encoder forward pass
+        self._embed_batcher = _EmbedBatcher(self.embedding_model, executor=self._pool)
+
+        # Semantic result cache: recently answered queries keyed by their
+        # L2-normalized embeddings. A near-duplicate query (cosine similarity
+        # above the threshold) reuses the stored result and skips retrieval
+        # and the LLM round trip entirely. FIFO-bounded. Vectors are stored
+        # int8-quantized with a per-vector dequantization scale: 4x smaller
+        # than fp32 and well within the tolerance of the 0.97 match
+        # threshold for normalized embeddings.
+        self._sem_cache_threshold = semantic_cache_threshold
+        self._sem_cache_size = 512
+        self._sem_cache_results: List[QueryResult] = []
+        self._sem_cache_matrix: Optional[np.ndarray] = None  # int8, (N, dim)
+        self._sem_cache_scales: Optional[np.ndarray] = None  # float32, (N,)
+
+        # Pooled HTTP session for LLM calls: keep-alive reuse means warm
+        # requests skip the per-call TCP + TLS handshake
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        ))
+
+        # Initialize ChromaDB client. In-process PersistentClient avoids the
+        # per-query HTTP/JSON round trip to the server, leaving only the HNSW
+        # graph traversal itself; the HTTP client remains the default for
+        # deployments with a shared ChromaDB server.
+        if chroma_persist_dir:
+            self.chroma_client = chromadb.PersistentClient(
+                path=chroma_persist_dir,
+                settings=Settings(allow_reset=True, anonymized_telemetry=False)
+            )
+        else:
+            self.chroma_client = chromadb.HttpClient(
+                host=chroma_host,
+                port=chroma_port,
+                settings=Settings(allow_reset=True, anonymized_telemetry=False)
+            )
 
         # Get ChromaDB collection
         try:
-            self.collection = self.chroma_client.get_collection(name="float_profiles")
-            logger.info("Connected to ChromaDB collection: float_profiles")
+            if chroma_persist_dir:
+                # Tuned HNSW parameters: a denser graph (M=24) built with a
+                # wider candidate list (construction_ef=128) gives better
+                # recall, and search_ef=100 keeps query-time accuracy high
+                # at sub-ms latency for collections of this size.
+                self.collection = self.chroma_client.get_or_create_collection(
+                    name="float_profiles",
+                    metadata={
+                        "hnsw:M": 24,
+                        "hnsw:construction_ef": 128,
+                        "hnsw:search_ef": 100,
+                    }
+                )
+                logger.info("Opened local ChromaDB collection: float_profiles")
+            else:
+                self.collection = self.chroma_client.get_collection(name="float_profiles")
+                logger.info("Connected to ChromaDB collection: float_profiles")
         except Exception as e:
             logger.error(f"Failed to connect to ChromaDB collection: {str(e)}")
             raise
@@ -131,6 +329,19 @@ class FloatChatRAGCore:
         self.geo_service = GeographicService(use_external_geocoding=True)
         logger.info("Initialized geographic service")
 
+        # Geocoding is skipped entirely unless the query contains a location
+        # hint (a preposition/water-body word or a known location name), and
+        # results are memoized per query text since they are deterministic
+        location_names = "|".join(
+            re.escape(name) for name in GeographicService.OCEANOGRAPHIC_LOCATIONS
+        )
+        self._loc_hint = re.compile(
+            rf'\b(near|in|at|around|close to|within|ocean|sea|gulf|bay|coast|'
+            rf'latitude|longitude|coordinates|{location_names})\b',
+            re.IGNORECASE
+        )
+        self._enhance_cached = functools.lru_cache(maxsize=2048)(self._enhance_with_location)
+
         # Safety constraints
         self.safety_constraints = """
         CRITICAL SAFETY CONSTRAINTS:
@@ -144,51 +355,250 @@ class FloatChatRAGCore:
         8. When location context is provided, use geographic proximity queries with proper coordinate filtering.
         """
 
-    def embed_query(self, query: str) -> List[float]:
+        # Static prompt prefix assembled once. Keeping the constant blocks
+        # (instructions, safety constraints, schema, few-shot examples) first
+        # and byte-identical across queries lets provider-side prompt caching
+        # reuse the prefix; only the suffix (context, history, query) varies.
+        examples_text = "\n\nFEW-SHOT EXAMPLES:\n"
+        for i, example in enumerate(self.few_shot_examples, 1):
+            examples_text += f"\nExample {i}:\n"
+            examples_text += f"Human: {example['query']}\n"
+            examples_text += f"SQL: {example['sql']}\n"
+            examples_text += "-" * 40 + "\n"
+
+        self._static_prefix = f"""You are a specialized SQL generator for oceanographic ARGO float data. Your task is to convert natural language queries into precise SQL SELECT statements.
+
+{self.safety_constraints}
+
+DATABASE SCHEMA:
+{self.database_schema}
+
+{examples_text}"""
+
+        # Constant blocks of the dynamic suffix, built once rather than
+        # re-interpolated into an f-string on every engineer_prompt call
+        self._guidelines_block = """Based on the provided context, database schema, conversation history, and examples, generate a SQL SELECT statement that accurately answers the user's query.
+
+IMPORTANT GUIDELINES:
+- Only generate a single SQL SELECT statement
+- Use proper table aliases for readability
+- Include appropriate JOINs to connect related tables
+- Add quality control filters for measurement data
+- Use LIMIT if the query might return many rows
+- Handle NULL values appropriately
+- If the user query mentions location, map, or coordinates, you MUST include the `c.latitude` and `c.longitude` columns from the `cycles` table in the SELECT statement.
+- When geographic context is provided, use the Haversine formula for proximity searches with the cycles table (aliased as 'c')
+- Return only the SQL statement, no explanations
+- PAY SPECIAL ATTENTION TO THE CONVERSATION HISTORY ABOVE - use it to understand the context of follow-up questions
+- If the user asks a follow-up question without specifying details, infer the context from the previous conversation"""
+
+        self._fallback_guidance = """
+
+IF NO RESULTS FOUND:
+- Try removing geographic constraints to check if data exists
+- Consider using broader geographic boundaries
+- Check if location is outside ARGO deployment areas
+- Try querying for global data with ORDER BY distance from target location"""
+
+        # Warm the cold paths so the first user query does not pay for them:
+        # a no-op count exercises the ChromaDB connection, and an OPTIONS
+        # probe to the LLM endpoint performs the TCP + TLS handshake once,
+        # leaving a warm socket in the pooled session
+        try:
+            self.collection.count()
+        except Exception as e:
+            logger.warning(f"ChromaDB warmup failed: {str(e)}")
+        if self.llm_provider == "deepseek":
+            try:
+                self._http.options("https://api.deepseek.com/v1/chat/completions", timeout=5)
+            except requests.RequestException as e:
+                logger.warning(f"LLM endpoint warmup failed: {str(e)}")
+
+    def embed_query(self, query: str) -> np.ndarray:
         """
         Convert user's natural language query to vector embedding.
 
+        The embedding stays a NumPy array throughout the pipeline — no
+        per-element Python boxing — and is L2-normalized at encode time so
+        cosine similarity downstream is a plain dot product. Conversion to
+        a list happens only at the ChromaDB client boundary.
+
         Args:
             query: Natural language query string
 
         Returns:
-            Query embedding as a list of floats
+            Query embedding as a normalized float32 array
+        """
+        cache_key = query.strip().lower()
+        cached = self._embed_cache.get(cache_key)
+        if cached is not None:
+            self._embed_cache.move_to_end(cache_key)
+            return cached
+
+        try:
+            embedding = self.embedding_model.encode(
+                query, convert_to_numpy=True, normalize_embeddings=True
+            ).astype(np.float32, copy=False)
+        except Exception as e:
+            logger.error(f"Error embedding query: {str(e)}")
+            raise
+
+        self._embed_cache[cache_key] = embedding
+        if len(self._embed_cache) > self._embed_cache_size:
+            self._embed_cache.popitem(last=False)
+        return embedding
+
+    async def embed_query_async(self, query: str) -> np.ndarray:
+        """
+        Async variant of embed_query used on the request path.
+
+        Cache misses go through the micro-batcher so concurrent requests
+        share a single encoder forward pass instead of encoding one query
+        at a time.
         """
+        cache_key = query.strip().lower()
+        cached = self._embed_cache.get(cache_key)
+        if cached is not None:
+            self._embed_cache.move_to_end(cache_key)
+            return cached
+
         try:
-            embedding = self.embedding_model.encode(query)
-            return embedding.tolist()
+            embedding = (await self._embed_batcher.encode(query)).astype(np.float32, copy=False)
         except Exception as e:
             logger.error(f"Error embedding query: {str(e)}")
             raise
 
-    def retrieve_context(self, query_embedding: List[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        self._embed_cache[cache_key] = embedding
+        if len(self._embed_cache) > self._embed_cache_size:
+            self._embed_cache.popitem(last=False)
+        return embedding
+
+    @staticmethod
+    def _quantize_embedding(embedding: List[float]) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Normalize an embedding and quantize it to int8 with a scale.
+
+        The cosine of two quantized vectors decomposes into an integer dot
+        product times the product of their scales, so the cache scan runs
+        on int8 rows with an int32 accumulation and one float multiply per
+        row. Returns None for degenerate (zero) vectors.
+        """
+        q = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return None
+        q /= norm
+        max_abs = float(np.abs(q).max())
+        if max_abs == 0:
+            return None
+        q_int8 = np.round(q * (127.0 / max_abs)).astype(np.int8)
+        return q_int8, max_abs / 127.0
+
+    def _semantic_cache_lookup(self, query_embedding: List[float]) -> Optional[QueryResult]:
+        """Return a cached result whose query embedding is close enough, if any."""
+        if self._sem_cache_matrix is None:
+            return None
+
+        quantized = self._quantize_embedding(query_embedding)
+        if quantized is None:
+            return None
+        q_int8, q_scale = quantized
+
+        # Integer dot products against all cached rows, then one scale
+        # multiply per row to recover the cosine. NumPy upcasts to int32
+        # for the accumulation (it cannot target VNNI int8 kernels
+        # directly), but the matrix read traffic is still a quarter of fp32.
+        dots = self._sem_cache_matrix.astype(np.int32) @ q_int8.astype(np.int32)
+        sims = dots.astype(np.float32) * self._sem_cache_scales * q_scale
+        best = int(np.argmax(sims))
+        if sims[best] >= self._sem_cache_threshold:
+            return self._sem_cache_results[best]
+        return None
+
+    def _semantic_cache_store(self, query_embedding: List[float], result: QueryResult) -> None:
+        """Store a quantized query embedding and its result, evicting FIFO."""
+        quantized = self._quantize_embedding(query_embedding)
+        if quantized is None:
+            return
+        q_int8, scale = quantized
+
+        if self._sem_cache_matrix is None:
+            self._sem_cache_matrix = q_int8[np.newaxis, :]
+            self._sem_cache_scales = np.array([scale], dtype=np.float32)
+        else:
+            if len(self._sem_cache_results) >= self._sem_cache_size:
+                self._sem_cache_matrix = self._sem_cache_matrix[1:]
+                self._sem_cache_scales = self._sem_cache_scales[1:]
+                self._sem_cache_results.pop(0)
+            self._sem_cache_matrix = np.vstack((self._sem_cache_matrix, q_int8))
+            self._sem_cache_scales = np.append(self._sem_cache_scales, np.float32(scale))
+        self._sem_cache_results.append(result)
+
+    def retrieve_context(self, query_embeddings: List[Any], top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Retrieve relevant context documents from ChromaDB.
 
+        Accepts one or several query embeddings; multiple embeddings (e.g.
+        from query expansion) are sent in a single batched call so the
+        round-trip cost is paid once, and the per-query result lists are
+        merged with duplicates dropped.
+
         Args:
-            query_embedding: Query vector embedding
-            top_k: Number of top results to retrieve
+            query_embeddings: A query embedding, or a list of them
+            top_k: Number of top results to retrieve per query
 
         Returns:
-            List of relevant context documents with metadata
+            List of relevant context documents with metadata, best first
         """
+        # A single flat embedding is wrapped for the batched API
+        if isinstance(query_embeddings, np.ndarray):
+            if query_embeddings.ndim == 1:
+                query_embeddings = [query_embeddings]
+            else:
+                query_embeddings = list(query_embeddings)
+        elif query_embeddings and not isinstance(query_embeddings[0], (list, np.ndarray)):
+            query_embeddings = [query_embeddings]
+
+        # The client serializes plain lists; arrays convert only here, at
+        # the ChromaDB boundary
+        query_embeddings = [
+            e.tolist() if isinstance(e, np.ndarray) else e for e in query_embeddings
+        ]
+
         try:
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=query_embeddings,
                 n_results=top_k,
-                include=['documents', 'metadatas', 'distances']
+                include=['documents', 'metadatas', 'distances', 'embeddings']
             )
 
             context_documents = []
-            if results['documents'] and results['documents'][0]:
-                for i in range(len(results['documents'][0])):
+            seen_ids = set()
+            embeddings = results.get('embeddings')
+            for q in range(len(results['ids'])):
+                # Convert the whole distance row to similarities in one
+                # vectorized op instead of one scalar subtraction per doc
+                sims = 1.0 - np.asarray(results['distances'][q], dtype=np.float32)
+                for i, (doc_id, content, metadata, sim) in enumerate(zip(
+                        results['ids'][q], results['documents'][q],
+                        results['metadatas'][q], sims)):
+                    if doc_id in seen_ids:
+                        continue
+                    seen_ids.add(doc_id)
                     doc = {
-                        'content': results['documents'][0][i],
-                        'metadata': results['metadatas'][0][i],
-                        'similarity_score': 1 - results['distances'][0][i]  # Convert distance to similarity
+                        'content': content,
+                        'metadata': metadata,
+                        'similarity_score': float(sim)
                     }
+                    if embeddings is not None:
+                        # Kept only for reranking; stripped before the result
+                        # leaves the RAG core
+                        doc['embedding'] = embeddings[q][i]
                     context_documents.append(doc)
 
+            if len(results['ids']) > 1:
+                context_documents.sort(key=lambda d: d['similarity_score'], reverse=True)
+
             logger.info(f"Retrieved {len(context_documents)} context documents")
             return context_documents
 
@@ -196,17 +606,81 @@ class FloatChatRAGCore:
             logger.error(f"Error retrieving context: {str(e)}")
             return []
 
-    def engineer_prompt(self, user_query: str, context_docs: List[Dict[str, Any]], conversation_context: Optional[str] = None) -> str:
+    def _enhance_with_location(self, user_query: str) -> Tuple[str, Optional[str]]:
         """
-        Assemble the complete prompt for the LLM with all required components.
+        Geocode-enhance a query, skipping the service when no hint matches.
+
+        Most queries ("show me latest", "thanks") carry no location at all,
+        so the cheap regex check saves the full geographic lookup for them.
+        Wrapped in an lru_cache at init time.
+        """
+        if not self._loc_hint.search(user_query):
+            return user_query, None
+        return self.geo_service.enhance_query_with_location(user_query)
+
+    def rerank_context(self, query_embedding: List[float],
+                       context_docs: List[Dict[str, Any]],
+                       lambda_mult: float = 0.7) -> List[Dict[str, Any]]:
+        """
+        Reorder retrieved documents by Maximal Marginal Relevance.
+
+        Balances query similarity against redundancy among the selected
+        documents so the prompt context covers more of the database instead
+        of repeating near-duplicate profiles. The pairwise similarity matrix
+        is computed once with a NumPy matmul; the selection loop runs
+        through Numba when available.
+
+        Args:
+            query_embedding: Query vector embedding
+            context_docs: Documents from retrieve_context (with embeddings)
+            lambda_mult: Relevance/diversity trade-off (1.0 = pure relevance)
+
+        Returns:
+            Reordered documents with internal embeddings stripped
+        """
+        if len(context_docs) <= 2 or 'embedding' not in context_docs[0]:
+            for doc in context_docs:
+                doc.pop('embedding', None)
+            return context_docs
+
+        embeds = np.asarray([doc['embedding'] for doc in context_docs], dtype=np.float32)
+        norms = np.linalg.norm(embeds, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        embeds /= norms
+
+        q = np.asarray(query_embedding, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm > 0:
+            q /= q_norm
+
+        sims_q = (embeds @ q).astype(np.float32)
+        sims_dd = embeds @ embeds.T
+
+        order = _mmr_select(sims_q, sims_dd, lambda_mult, len(context_docs))
+
+        reranked = [context_docs[i] for i in order]
+        for doc in reranked:
+            doc.pop('embedding', None)
+        return reranked
+
+    def engineer_prompt(self, user_query: str, context_docs: List[Dict[str, Any]], conversation_context: Optional[str] = None,
+                        location_context: Optional[str] = None) -> str:
+        """
+        Assemble the dynamic portion of the LLM prompt.
+
+        The constant blocks (instructions, safety constraints, schema, and
+        few-shot examples) live in the static prefix built at init time and
+        are sent as the system message, so only per-query content is built
+        here.
 
         Args:
             user_query: Original user query
             context_docs: Retrieved context documents
             conversation_context: Optional conversation history for context awareness
+            location_context: Optional geographic context computed by the caller
 
         Returns:
-            Complete engineered prompt string
+            Dynamic prompt suffix string
         """
         # Format context documents
         context_text = ""
@@ -215,7 +689,7 @@ class FloatChatRAGCore:
             for i, doc in enumerate(context_docs, 1):
                 context_text += f"\nContext {i} (Similarity: {doc['similarity_score']:.3f}):\n"
                 context_text += doc['content']
-                context_text += f"\nMetadata: {json.dumps(doc['metadata'], indent=2)}\n"
+                context_text += f"\nMetadata: {orjson.dumps(doc['metadata'], option=orjson.OPT_INDENT_2).decode()}\n"
                 context_text += "-" * 80 + "\n"
 
         # Format conversation context if available
@@ -223,62 +697,23 @@ class FloatChatRAGCore:
         if conversation_context:
             conversation_text = f"\n\nCONVERSATION HISTORY:\n{conversation_context}\n"
 
-        # Check for location context
-        location_context = None
-        enhanced_query, location_context = self.geo_service.enhance_query_with_location(user_query)
-        
         location_text = ""
         fallback_guidance = ""
         if location_context:
             location_text = f"\n\nGEOGRAPHIC CONTEXT:\n{location_context}\n"
-            fallback_guidance = """
-
-IF NO RESULTS FOUND:
-- Try removing geographic constraints to check if data exists
-- Consider using broader geographic boundaries
-- Check if location is outside ARGO deployment areas
-- Try querying for global data with ORDER BY distance from target location"""
-
-        # Format few-shot examples
-        examples_text = "\n\nFEW-SHOT EXAMPLES:\n"
-        for i, example in enumerate(self.few_shot_examples, 1):
-            examples_text += f"\nExample {i}:\n"
-            examples_text += f"Human: {example['query']}\n"
-            examples_text += f"SQL: {example['sql']}\n"
-            examples_text += "-" * 40 + "\n"
+            fallback_guidance = self._fallback_guidance
 
-        # Assemble complete prompt
-        prompt = f"""You are a specialized SQL generator for oceanographic ARGO float data. Your task is to convert natural language queries into precise SQL SELECT statements.
-
-{conversation_text}
-
-{self.safety_constraints}
-
-DATABASE SCHEMA:
-{self.database_schema}
+        # Assemble the dynamic suffix; the static prefix is the system message
+        # and the guideline block is precomputed at init
+        prompt = f"""{conversation_text}
 
 {context_text}
 
 {location_text}
 
-{examples_text}
-
 USER QUERY: {user_query}
 
-Based on the provided context, database schema, conversation history, and examples, generate a SQL SELECT statement that accurately answers the user's query.
-
-IMPORTANT GUIDELINES:
-- Only generate a single SQL SELECT statement
-- Use proper table aliases for readability
-- Include appropriate JOINs to connect related tables
-- Add quality control filters for measurement data
-- Use LIMIT if the query might return many rows
-- Handle NULL values appropriately
-- If the user query mentions location, map, or coordinates, you MUST include the `c.latitude` and `c.longitude` columns from the `cycles` table in the SELECT statement.
-- When geographic context is provided, use the Haversine formula for proximity searches with the cycles table (aliased as 'c')
-- Return only the SQL statement, no explanations
-- PAY SPECIAL ATTENTION TO THE CONVERSATION HISTORY ABOVE - use it to understand the context of follow-up questions
-- If the user asks a follow-up question without specifying details, infer the context from the previous conversation
+{self._guidelines_block}
 {fallback_guidance}
 
 SQL:"""
@@ -304,7 +739,8 @@ SQL:"""
             if os.getenv("OPENROUTER_SITE_NAME"):
                 extra_headers["X-Title"] = os.getenv("OPENROUTER_SITE_NAME")
 
-            completion = self.llm_client.chat.completions.create(
+            # The shared client from main.get_llm_client() is AsyncOpenAI
+            completion = await self.llm_client.chat.completions.create(
                 model=os.getenv("OPENROUTER_MODEL", "google/gemini-flash-1.5"),
                 messages=messages,
                 extra_headers=extra_headers,
@@ -320,33 +756,73 @@ SQL:"""
             api_key = os.getenv("DEEPSEEK_API_KEY")
             if not api_key:
                 raise ValueError("DEEPSEEK_API_KEY is not set")
-            
+
+            # Stream with a ';' stop sequence: a SQL statement ends at its
+            # first semicolon, so there is no reason to wait for the model
+            # to exhaust max_tokens before the response returns
             payload = {
                 "model": os.getenv("DEEPSEEK_MODEL", "deepseek-chat"),
                 "messages": messages,
                 "temperature": kwargs.get("temperature", 0.1),
                 "max_tokens": kwargs.get("max_tokens", 512),
-                "top_p": kwargs.get("top_p", 0.9)
+                "top_p": kwargs.get("top_p", 0.9),
+                "stream": True,
+                "stop": [";"]
             }
             headers = {
                 "Content-Type": "application/json",
                 "Authorization": f"Bearer {api_key}"
             }
             llm_endpoint = "https://api.deepseek.com/v1/chat/completions"
-            
-            response = requests.post(llm_endpoint, json=payload, headers=headers, timeout=30)
-            response.raise_for_status()
-            return response.json()['choices'][0]['message']['content'].strip()
+
+            # Run the blocking pooled-session call on the worker pool so the
+            # event loop stays free for other requests
+            content = await asyncio.get_running_loop().run_in_executor(
+                self._pool, self._deepseek_stream, llm_endpoint, payload, headers
+            )
+            return content.strip()
         else:
             raise ValueError(f"Unsupported LLM provider: {self.llm_provider}")
 
+    def _deepseek_stream(self, endpoint: str, payload: Dict[str, Any],
+                         headers: Dict[str, str]) -> str:
+        """
+        Consume a streamed DeepSeek completion, terminating early.
+
+        Accumulates SSE delta chunks and closes the connection as soon as a
+        semicolon arrives (the server-side stop sequence usually ends the
+        stream first; this guards against providers that ignore it), so
+        latency tracks the actual SQL length rather than max_tokens.
+        """
+        response = self._http.post(endpoint, json=payload, headers=headers,
+                                   timeout=30, stream=True)
+        try:
+            response.raise_for_status()
+            chunks = []
+            for line in response.iter_lines():
+                if not line or not line.startswith(b"data: "):
+                    continue
+                data = line[len(b"data: "):]
+                if data == b"[DONE]":
+                    break
+                delta = orjson.loads(data)['choices'][0].get('delta', {})
+                content = delta.get('content')
+                if not content:
+                    continue
+                chunks.append(content)
+                if ';' in content:
+                    break
+            return ''.join(chunks)
+        finally:
+            response.close()
+
     async def invoke_llm(self, prompt: str) -> str:
         """Send prompt to the configured LLM and return the generated SQL."""
         try:
             messages = [
                 {
                     "role": "system",
-                    "content": "You are a specialized SQL generator for oceanographic ARGO float data. Your task is to convert natural language queries into precise SQL SELECT statements."
+                    "content": self._static_prefix
                 },
                 {
                     "role": "user",
@@ -361,6 +837,27 @@ SQL:"""
             logger.error(f"Error invoking LLM: {str(e)}")
             raise
 
+    # Greetings and acknowledgements that occasionally reach the RAG
+    # pipeline; they carry no data intent, so the full embed/retrieve/LLM
+    # path is wasted on them
+    _CONVERSATIONAL_PHRASES = frozenset({
+        "hi", "hello", "hey", "thanks", "thank you", "ok", "okay",
+        "bye", "goodbye", "how are you", "good morning", "good evening",
+        "cool", "great", "awesome", "help"
+    })
+
+    @classmethod
+    def _is_conversational(cls, query: str) -> bool:
+        """Cheap check for greeting/acknowledgement queries with no data intent."""
+        q = query.strip().lower().rstrip('!.?')
+        return q in cls._CONVERSATIONAL_PHRASES
+
+    # Precompiled patterns for _clean_sql_output; it runs on every LLM
+    # response, so the cleanup is two substitutions instead of three
+    # full string scans
+    _CODEFENCE = re.compile(r"```(?:sql)?")
+    _WS = re.compile(r"\s+")
+
     def _clean_sql_output(self, sql_output: str) -> str:
         """
         Clean and validate the SQL output from the LLM.
@@ -371,11 +868,9 @@ SQL:"""
         Returns:
             Cleaned SQL query
         """
-        # Remove markdown code blocks if present
-        sql_output = sql_output.replace('```sql', '').replace('```', '')
-
-        # Remove extra whitespace and newlines
-        sql_output = ' '.join(sql_output.split())
+        # Strip markdown code fences, then collapse whitespace runs
+        sql_output = self._CODEFENCE.sub('', sql_output)
+        sql_output = self._WS.sub(' ', sql_output).strip()
 
         # Ensure it ends with semicolon
         if not sql_output.endswith(';'):
@@ -397,23 +892,33 @@ SQL:"""
         """
         score = 0.0
 
-        # Base score from context relevance
+        # Base score from context relevance; NumPy reduction once the doc
+        # count is large enough to pay for the array conversion
         if context_docs:
-            avg_similarity = sum(doc['similarity_score'] for doc in context_docs) / len(context_docs)
+            if len(context_docs) >= 64:
+                avg_similarity = float(np.fromiter(
+                    (doc['similarity_score'] for doc in context_docs),
+                    dtype=np.float32, count=len(context_docs)
+                ).mean())
+            else:
+                avg_similarity = sum(doc['similarity_score'] for doc in context_docs) / len(context_docs)
             score += avg_similarity * 0.6
 
-        # Score based on SQL query characteristics
+        # Score based on SQL query characteristics; upper-case once instead
+        # of once per check
         if sql_query:
+            up = sql_query.upper()
+
             # Check for proper SELECT statement
-            if sql_query.upper().strip().startswith('SELECT'):
+            if up.strip().startswith('SELECT'):
                 score += 0.2
 
             # Check for proper JOIN usage
-            if 'JOIN' in sql_query.upper():
+            if 'JOIN' in up:
                 score += 0.1
 
             # Check for WHERE clause
-            if 'WHERE' in sql_query.upper():
+            if 'WHERE' in up:
                 score += 0.1
 
         return min(score, 1.0)
@@ -432,15 +937,44 @@ SQL:"""
         start_time = time.time()
 
         try:
+            # Trivial-query short circuit: greetings that slip past intent
+            # detection skip embedding, retrieval, and the LLM call
+            if self._is_conversational(user_query):
+                logger.info(f"Conversational query short-circuited: {user_query}")
+                return QueryResult(
+                    sql_query="",
+                    confidence_score=1.0,
+                    retrieved_context=[],
+                    processing_time=time.time() - start_time,
+                    reasoning="Conversational query - no SQL generation needed"
+                )
+
             # Step 1: Embed the query
             logger.info(f"Processing query: {user_query}")
-            query_embedding = self.embed_query(user_query)
+            query_embedding = await self.embed_query_async(user_query)
+
+            # Semantic cache: a near-duplicate query reuses the stored result
+            cached_result = self._semantic_cache_lookup(query_embedding)
+            if cached_result is not None:
+                processing_time = time.time() - start_time
+                logger.info(f"Semantic cache hit, answered in {processing_time:.4f}s")
+                return replace(cached_result, processing_time=processing_time)
+
+            # Steps 2-3: the ChromaDB round trip and the geographic lookup
+            # are independent, so overlap them on the worker pool instead of
+            # running serially
+            loop = asyncio.get_running_loop()
+            context_docs, (_, location_context) = await asyncio.gather(
+                loop.run_in_executor(self._pool, self.retrieve_context, query_embedding),
+                loop.run_in_executor(self._pool, self._enhance_cached, user_query),
+            )
 
-            # Step 2: Retrieve relevant context
-            context_docs = self.retrieve_context(query_embedding)
+            # Reorder retrieved docs for relevance + diversity before they
+            # enter the prompt
+            context_docs = self.rerank_context(query_embedding, context_docs)
 
             # Step 3: Engineer the prompt with conversation context
-            prompt = self.engineer_prompt(user_query, context_docs, conversation_context)
+            prompt = self.engineer_prompt(user_query, context_docs, conversation_context, location_context)
 
             # Step 4: Invoke LLM
             sql_query = await self.invoke_llm(prompt)
@@ -458,6 +992,8 @@ SQL:"""
                 reasoning="Here is the data you requested:"
             )
 
+            self._semantic_cache_store(query_embedding, result)
+
             logger.info(f"Query processed successfully in {processing_time:.2f}s")
             return result
 
@@ -3,7 +3,9 @@
 Test script to verify geographic queries work with Supabase PostgreSQL
 """
 
+import logging
 import os
+import re
 import sys
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
@@ -12,6 +14,25 @@ from sqlalchemy import create_engine, text
 sys.path.append('/Users/shyamolkonwar/Documents/VOID/VOID_1/backend/src')
 from geocoding_service import GeographicService
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Compiled once at import; re.search with a literal pattern would
+# recompile (or at least re-hash into the regex cache) on every call
+_SQL_RE = re.compile(r'SELECT.*?;', re.DOTALL)
+
+# Shared service instance: GeographicService construction is cheap today,
+# but keeping one per process means warm re-runs (watch mode, repeated
+# invocations from a runner) never pay the constructor again, and any
+# state it grows later — geocoding caches, HTTP clients — is reused too.
+_geo_service = None
+
+def get_geo() -> GeographicService:
+    global _geo_service
+    if _geo_service is None:
+        _geo_service = GeographicService()
+    return _geo_service
+
 def test_supabase_connection():
     """Test connection to Supabase and run sample geographic queries"""
     load_dotenv()
@@ -45,7 +66,7 @@ def test_supabase_connection():
                   f"Lon {ranges.min_lon:.2f} to {ranges.max_lon:.2f}")
             
             # Test Mumbai query
-            geo_service = GeographicService()
+            geo_service = get_geo()
             mumbai_query = "Show me temperature measurements near Mumbai"
             
             _, location_context = geo_service.enhance_query_with_location(mumbai_query)
@@ -53,8 +74,7 @@ def test_supabase_connection():
                 print("\n✓ Location context generated for Mumbai")
                 
                 # Extract the SQL from context
-                import re
-                sql_match = re.search(r'SELECT.*?;', location_context, re.DOTALL)
+                sql_match = _SQL_RE.search(location_context)
                 if sql_match:
                     sql_query = sql_match.group(0)
                     
@@ -96,10 +116,10 @@ def test_supabase_connection():
             else:
                 print("✗ No location context generated")
                 
-    except Exception as e:
-        print(f"✗ Error testing Supabase: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        # logger.exception defers traceback formatting to the handler,
+        # matching the logging pattern in test_sync_small.py
+        logger.exception("✗ Error testing Supabase")
 
 if __name__ == "__main__":
     print("Testing Supabase PostgreSQL geographic queries...")
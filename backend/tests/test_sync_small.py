@@ -48,12 +48,33 @@ def test_sync_small():
             table_list = [row[0] for row in tables.fetchall()]
             logger.info(f"Found tables: {table_list}")
             
-            # Test small data fetch
+            # Test small data fetch. All row counts come back in one UNION
+            # ALL round trip instead of one COUNT query per table, which
+            # matters against a remote database where each statement pays
+            # the full network latency.
+            counts = {}
+            if table_list:
+                counts_sql = " UNION ALL ".join(
+                    f"SELECT '{table}' AS table_name, COUNT(*) AS n FROM {table}"
+                    for table in table_list
+                )
+                counts = dict(conn.execute(text(counts_sql)).fetchall())
+
+            # Previews reuse the same connection with a local compiled-
+            # statement cache, so each text() clause is compiled once.
+            # stream_results runs them through a server-side cursor: the
+            # driver buffers at most max_row_buffer rows instead of the
+            # whole result set, so this loop stays O(buffer) in memory
+            # even if the LIMIT is raised or dropped during debugging.
+            preview_conn = conn.execution_options(
+                compiled_cache={}, stream_results=True, max_row_buffer=100
+            )
             for table in table_list:
-                count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).fetchone()[0]
-                sample = conn.execute(text(f"SELECT * FROM {table} LIMIT 5"))
+                sample = preview_conn.execute(text(f"SELECT * FROM {table} LIMIT 5"))
                 columns = list(sample.keys())
-                logger.info(f"{table}: {count} rows, columns: {columns}")
+                for _ in sample:
+                    pass  # drain the streamed rows without materializing
+                logger.info(f"{table}: {counts.get(table, 0)} rows, columns: {columns}")
         
         # Test online Supabase connection
         logger.info("Testing online Supabase connection...")